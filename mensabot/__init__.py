@@ -2,6 +2,13 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from .mensabot import Mensabot
+__all__ = ('Mensabot',)
 
-__all__ = (Mensabot)
+
+def __getattr__(name):
+    # Mensabot needs python-telegram-bot, import it lazily so that offline
+    # tools such as scripts/freshness_sim.py work without it
+    if name == 'Mensabot':
+        from .mensabot import Mensabot
+        return Mensabot
+    raise AttributeError(name)
@@ -0,0 +1,260 @@
+# Append-only archive of every menu fetched from OpenMensa.
+#
+# Records are stored as fixed-width binary rows in `records.bin` so that the
+# file can be memory-mapped as a set of NumPy columns. Dish and category
+# names are dictionary-encoded: every distinct string is written once to
+# `strings.jsonl` and rows only refer to its index.
+#
+# Menus are often fetched days in advance and may change until they are
+# served. Every change is appended as a new version, statistics only use
+# the latest version of each day.
+
+import datetime
+import json
+import logging
+import os
+import struct
+from collections import defaultdict
+from threading import RLock
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------
+# Constants and Magic Values
+# ---------------------------------
+
+_RECORDS_FILE = 'records.bin'
+_STRINGS_FILE = 'strings.jsonl'
+
+# date as proleptic ordinal, canteen id, category string id,
+# dish string id, student price in cents (-1 if unknown), version
+_RECORD_STRUCT = struct.Struct('<iIIIiI')
+_RECORD_DTYPE = numpy.dtype([
+    ('date', '<i4'),
+    ('canteen', '<u4'),
+    ('category', '<u4'),
+    ('dish', '<u4'),
+    ('price', '<i4'),
+    ('version', '<u4'),
+])
+_NO_PRICE = -1
+
+# Menus of days further back than this cannot be fetched anymore, see
+# `openmensa._validate_date`
+_RECENT_DAYS = datetime.timedelta(days=8)
+
+# Ordinal of the unix epoch, used to convert ordinals to datetime64
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+# ---------------------------------
+# Helper functions
+# ---------------------------------
+
+def _semester_keys(ordinals):
+    """Maps an array of date ordinals to semester keys.
+
+    The winter semester runs from October to March, the summer semester from
+    April to September. A key is `2 * year + 1` for the winter semester
+    starting in `year` and `2 * year` for the summer semester of `year`.
+    """
+    days = (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+    months = days.astype('datetime64[M]').astype(numpy.int64)
+    year = months // 12 + 1970
+    month = months % 12 + 1
+    winter = (month >= 10) | (month <= 3)
+    start_year = numpy.where(month <= 3, year - 1, year)
+    return start_year * 2 + winter
+
+
+def _latest_versions(columns):
+    """Returns a mask selecting the rows of the latest archived version of
+    every `(canteen, date)`."""
+    if len(columns) == 0:
+        return numpy.zeros(0, dtype=bool)
+    keys = (columns['canteen'].astype(numpy.int64) << 32) \
+        | columns['date'].astype(numpy.int64)
+    _, inverse = numpy.unique(keys, return_inverse=True)
+    latest = numpy.zeros(inverse.max() + 1, dtype=columns['version'].dtype)
+    numpy.maximum.at(latest, inverse, columns['version'])
+    return columns['version'] == latest[inverse]
+
+
+def semester_name(key):
+    """Returns a readable name such as `WS 2018/19` or `SS 2019` for a key
+    as produced by :func:`_semester_keys`."""
+    year, winter = divmod(int(key), 2)
+    if winter:
+        return 'WS {}/{:02d}'.format(year, (year + 1) % 100)
+    return 'SS {}'.format(year)
+
+
+# ---------------------------------
+# Archive
+# ---------------------------------
+
+class MenuArchive(object):
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._mutex = RLock()
+        self._strings = []
+        self._string_ids = {}
+        self._load_strings()
+        self._truncate_records()
+        columns = self._columns()
+        self._next_version = int(columns['version'].max()) + 1 \
+            if len(columns) else 0
+        self._recent = self._load_recent(columns)
+
+    def _load_recent(self, columns):
+        # Rows of the latest version of days that can still be fetched,
+        # used to skip menus that did not change since they were archived.
+        cutoff = (datetime.date.today() - _RECENT_DAYS).toordinal()
+        recent = columns[_latest_versions(columns)
+                         & (columns['date'] >= cutoff)]
+        rows = defaultdict(list)
+        for date, canteen, category, dish, price, _ in recent.tolist():
+            rows[(canteen, date)].append((category, dish, price))
+        return dict(rows)
+
+    def _load_strings(self):
+        strings_path = os.path.join(self.path, _STRINGS_FILE)
+        try:
+            with open(strings_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A crash while appending may leave an incomplete last line, which
+        # is cut off so that the next string starts on a line of its own
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            logger.warning('Removing incomplete string from %s', strings_path)
+            os.truncate(strings_path, complete)
+        for line in data[:complete].decode('utf-8').splitlines():
+            string = json.loads(line)
+            self._string_ids[string] = len(self._strings)
+            self._strings.append(string)
+
+    def _truncate_records(self):
+        # Cut off an incomplete record left by a crash, later records would
+        # be misaligned otherwise
+        records_path = os.path.join(self.path, _RECORDS_FILE)
+        if not os.path.exists(records_path):
+            return
+        size = os.path.getsize(records_path)
+        if size % _RECORD_STRUCT.size:
+            logger.warning('Removing incomplete record from %s', records_path)
+            os.truncate(records_path, size - size % _RECORD_STRUCT.size)
+
+    def _string_id(self, string, strings_file):
+        # Must be called with the mutex held
+        if string not in self._string_ids:
+            strings_file.write(json.dumps(string, ensure_ascii=False) + '\n')
+            self._string_ids[string] = len(self._strings)
+            self._strings.append(string)
+        return self._string_ids[string]
+
+    def _columns(self):
+        """Returns the archive as a memory-mapped structured array."""
+        records_path = os.path.join(self.path, _RECORDS_FILE)
+        if not os.path.exists(records_path) \
+                or os.path.getsize(records_path) < _RECORD_STRUCT.size:
+            return numpy.zeros(0, dtype=_RECORD_DTYPE)
+        count = os.path.getsize(records_path) // _RECORD_STRUCT.size
+        return numpy.memmap(records_path, dtype=_RECORD_DTYPE, mode='r',
+                            shape=(count,))
+
+    def _latest_columns(self):
+        columns = self._columns()
+        return columns[_latest_versions(columns)]
+
+    def append(self, canteen_id, date, menu):
+        """Adds the menu of a canteen for a day to the archive.
+
+        If the menu differs from the one archived last for that day, it is
+        archived as a new version, otherwise it is ignored.
+
+        :param canteen_id: OpenMensa id of the canteen
+        :param date: The date the menu is for
+        :param menu: A menu as returned by `_make_dict_from_response`
+        """
+        key = (canteen_id, date.toordinal())
+        if not isinstance(menu, dict):
+            return
+        with self._mutex:
+            rows = []
+            with open(os.path.join(self.path, _STRINGS_FILE), 'a',
+                      encoding='utf-8') as strings_file:
+                for category, meal in menu.items():
+                    category_id = self._string_id(category, strings_file)
+                    price = meal.get('price')
+                    price = _NO_PRICE if price is None else round(price * 100)
+                    for dish in meal['name']:
+                        rows.append((category_id,
+                                     self._string_id(dish, strings_file),
+                                     price))
+            if self._recent.get(key) == rows:
+                return
+
+            with open(os.path.join(self.path, _RECORDS_FILE), 'ab') as f:
+                f.write(b''.join(
+                    _RECORD_STRUCT.pack(key[1], canteen_id, category, dish,
+                                        price, self._next_version)
+                    for category, dish, price in rows))
+            self._next_version += 1
+
+            self._recent[key] = rows
+            cutoff = (datetime.date.today() - _RECENT_DAYS).toordinal()
+            for k in [k for k in self._recent if k[1] < cutoff]:
+                del self._recent[k]
+            logger.debug('Archived %d dishes of canteen %d for %s',
+                         len(rows), canteen_id, date.isoformat())
+
+    def average_price_by_semester(self, category, canteen_id=None):
+        """Returns the average student price of a category for each semester.
+
+        :param category: Category name such as 'Tellergericht'
+        :param canteen_id: Restricts the statistic to one canteen if given
+        :return: A list of `(semester name, average price)` tuples, sorted
+            chronologically
+        """
+        category_id = self._string_ids.get(category)
+        if category_id is None:
+            return []
+        columns = self._latest_columns()
+        mask = (columns['category'] == category_id) \
+            & (columns['price'] != _NO_PRICE)
+        if canteen_id is not None:
+            mask &= columns['canteen'] == canteen_id
+        if not mask.any():
+            return []
+
+        keys, inverse = numpy.unique(_semester_keys(columns['date'][mask]),
+                                     return_inverse=True)
+        sums = numpy.bincount(inverse, weights=columns['price'][mask])
+        counts = numpy.bincount(inverse)
+        return [(semester_name(key), total / count / 100)
+                for key, total, count in zip(keys, sums, counts)]
+
+    def dish_frequency(self, text, limit=5):
+        """Returns how often dishes containing `text` have been served.
+
+        :param text: Case-insensitive substring of the dish name
+        :param limit: Maximum number of dishes returned
+        :return: A list of `(dish name, times served)` tuples, most frequent
+            first
+        """
+        text = text.lower()
+        dish_ids = [idx for idx, s in enumerate(self._strings)
+                    if text in s.lower()]
+        if not dish_ids:
+            return []
+        columns = self._latest_columns()
+        served = columns['dish'][numpy.isin(columns['dish'], dish_ids)]
+        counts = numpy.bincount(served, minlength=len(self._strings))
+        top = [i for i in numpy.argsort(-counts, kind='stable')[:limit]
+               if counts[i] > 0]
+        return [(self._strings[i], int(counts[i])) for i in top]
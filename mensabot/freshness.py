@@ -0,0 +1,198 @@
+# Freshness policies decide for how long a fetched menu is cached.
+#
+# A policy gets the date of the menu, the current date, a fingerprint of the
+# fetched menu and the rate at which the canteen's menus changed on re-fetch.
+# It returns a `datetime.timedelta` or `None` if the menu should not be
+# cached at all.
+
+import datetime
+import time
+from collections import defaultdict, namedtuple
+from threading import Lock
+
+from .jsonlines import JsonLinesWriter
+
+# ---------------------------------
+# Fingerprints
+# ---------------------------------
+
+# Fingerprints of days without a menu, any other fingerprint is a menu hash
+CLOSED = 'closed'
+MISSING = 'missing'
+
+# Fingerprints and re-fetches of days further back than this are forgotten
+_CHANGE_RATE_WINDOW = datetime.timedelta(days=8)
+
+
+class ChangeRate(object):
+    """Tracks how often re-fetching a day returned a different menu.
+
+    Only days within `_CHANGE_RATE_WINDOW` of today are taken into account,
+    so the rate follows recent changes of the canteen's plans.
+    """
+
+    def __init__(self):
+        self._fingerprints = {}
+        # date -> [re-fetches, changes]
+        self._refetches = {}
+        self._mutex = Lock()
+
+    def observe(self, date, fingerprint, today):
+        with self._mutex:
+            if date in self._fingerprints:
+                counts = self._refetches.setdefault(date, [0, 0])
+                counts[0] += 1
+                if self._fingerprints[date] != fingerprint:
+                    counts[1] += 1
+            self._fingerprints[date] = fingerprint
+            for d in [d for d in self._fingerprints
+                      if d < today - _CHANGE_RATE_WINDOW]:
+                del self._fingerprints[d]
+                self._refetches.pop(d, None)
+
+    @property
+    def refetches(self):
+        with self._mutex:
+            return sum(counts[0] for counts in self._refetches.values())
+
+    @property
+    def changes(self):
+        with self._mutex:
+            return sum(counts[1] for counts in self._refetches.values())
+
+    @property
+    def rate(self):
+        # Laplace smoothing, a canteen without re-fetches is assumed to
+        # change its menu every other time
+        return (self.changes + 1) / (self.refetches + 2)
+
+
+# ---------------------------------
+# Policies
+# ---------------------------------
+
+class FixedFreshnessPolicy(object):
+    """Caches every day for `keep`, except days at least `max_age` in the
+    past, which are not cached."""
+
+    def __init__(self, keep=datetime.timedelta(days=7),
+                 max_age=datetime.timedelta(days=2)):
+        self.keep = keep
+        self.max_age = max_age
+
+    def ttl(self, date, today, fingerprint, change_rate):
+        if today - date >= self.max_age:
+            return None
+        return self.keep
+
+
+class AdaptiveFreshnessPolicy(object):
+    """Sets the time to live from the kind of entry, how far the day is in
+    the future and how often the canteen's menus changed on re-fetch.
+
+    Past menus are not going to change anymore and are kept for `past`.
+    Closed days rarely open again and are kept for `closed`. A missing menu
+    is likely to be published soon and is kept for `missing` only. Menus
+    for today and the future are kept up to `upcoming`, shortened by the
+    change rate and divided by one plus the number of days ahead, but never
+    less than `minimum`.
+    """
+
+    def __init__(self, past=datetime.timedelta(days=7),
+                 closed=datetime.timedelta(days=1),
+                 missing=datetime.timedelta(hours=1),
+                 upcoming=datetime.timedelta(days=1),
+                 minimum=datetime.timedelta(minutes=30)):
+        self.past = past
+        self.closed = closed
+        self.missing = missing
+        self.upcoming = upcoming
+        self.minimum = minimum
+
+    def ttl(self, date, today, fingerprint, change_rate):
+        if fingerprint == CLOSED:
+            return self.closed
+        if fingerprint == MISSING:
+            return self.missing
+        days_ahead = (date - today).days
+        if days_ahead < 0:
+            return self.past
+        ttl = self.upcoming * (1 - change_rate) / (1 + days_ahead)
+        return max(ttl, self.minimum)
+
+
+FRESHNESS_POLICIES = {
+    'fixed': FixedFreshnessPolicy,
+    'adaptive': AdaptiveFreshnessPolicy,
+}
+
+
+# ---------------------------------
+# Fetch history and simulation
+# ---------------------------------
+
+class FetchRecorder(object):
+    """Appends every menu lookup of the canteens to a JSONL file.
+
+    Lookups that had to fetch the menu from OpenMensa also contain the
+    fingerprint of the fetched menu.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = JsonLinesWriter(path)
+
+    def record(self, canteen_id, date, fingerprint=None):
+        entry = {'time': round(time.time(), 3), 'canteen': canteen_id,
+                 'date': date.isoformat()}
+        if fingerprint is not None:
+            entry['menu'] = fingerprint
+        self._writer.write(entry)
+
+
+SimulationResult = namedtuple('SimulationResult', ['hits', 'misses', 'stale'])
+
+
+def simulate(policy, history):
+    """Replays a fetch history against a policy.
+
+    Every entry counts as a lookup. Entries with a fingerprint tell which
+    menu OpenMensa served at that time; lookups before the first fetch of a
+    day are skipped. A hit is stale if the cached fingerprint differs from
+    the latest one known at that time.
+
+    :param policy: The freshness policy to evaluate
+    :param history: Entries as written by :class:`FetchRecorder`
+    :rtype: SimulationResult
+    """
+    cache = {}
+    current = {}
+    change_rates = defaultdict(ChangeRate)
+    hits = misses = stale = 0
+
+    for entry in sorted(history, key=lambda e: e['time']):
+        now = datetime.datetime.fromtimestamp(entry['time'])
+        date = datetime.date.fromisoformat(entry['date'])
+        key = (entry['canteen'], date)
+        if 'menu' in entry:
+            current[key] = entry['menu']
+        if key not in current:
+            continue
+
+        cached = cache.get(key)
+        if cached is not None and cached[1] > now:
+            hits += 1
+            if cached[0] != current[key]:
+                stale += 1
+            continue
+
+        misses += 1
+        change_rate = change_rates[entry['canteen']]
+        change_rate.observe(date, current[key], now.date())
+        ttl = policy.ttl(date, now.date(), current[key], change_rate.rate)
+        if ttl is None:
+            cache.pop(key, None)
+        else:
+            cache[key] = (current[key], now + ttl)
+
+    return SimulationResult(hits, misses, stale)
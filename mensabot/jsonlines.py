@@ -0,0 +1,22 @@
+# Shared by the recorders of updates and menu fetches. Kept free of
+# telegram imports so that offline tools like scripts/freshness_sim.py can
+# use it.
+
+import json
+from threading import Lock
+
+
+class JsonLinesWriter(object):
+    """Appends one JSON object per line to a file, safe to share between
+    threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._mutex = Lock()
+
+    def write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._mutex:
+            self._file.write(line)
+            self._file.flush()
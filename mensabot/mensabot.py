@@ -2,10 +2,12 @@ import datetime
 from collections import namedtuple
 import logging
 
+import requests
 from telegram.ext import CommandHandler
 
 from . import message_texts
-from .openmensa import OpenMensaCanteen, NoMenuAvailableError, CanteenClosedError
+from .openmensa import (OpenMensaCache, OpenMensaCanteen, NoMenuAvailableError,
+                        CanteenClosedError)
 
 logger = logging.getLogger(__name__)
 
@@ -78,11 +80,28 @@ def _parse_date(date_input):
 # Mensabot
 # ---------------------------------
 
+# Category names accepted by /stats, case-insensitive
+_STATS_CATEGORIES = {
+    category.lower(): category
+    for category in message_texts.get_menu_categories()
+}
+_STATS_DEFAULT_CATEGORY = 'Tellergericht'
+
+
 class Mensabot(object):
-    def __init__(self):
-        self.mensa_academica = OpenMensaCanteen(187, 'Mensa Academica')
-        self.mensa_ahorn = OpenMensaCanteen(95, 'Mensa Ahorn')
-        self.mensa_vita = OpenMensaCanteen(96, 'Mensa Vita')
+    def __init__(self, archive=None, admin_chat_ids=()):
+        self.archive = archive
+        self.admin_chat_ids = set(admin_chat_ids)
+        # One cache shared by all canteens
+        self.cache = OpenMensaCache()
+        self.mensa_academica = OpenMensaCanteen(187, 'Mensa Academica',
+                                                archive, self.cache)
+        self.mensa_ahorn = OpenMensaCanteen(95, 'Mensa Ahorn', archive,
+                                            self.cache)
+        self.mensa_vita = OpenMensaCanteen(96, 'Mensa Vita', archive,
+                                           self.cache)
+        self.canteens = [self.mensa_academica, self.mensa_ahorn,
+                         self.mensa_vita]
         self.mensa_arg_map = {
             'academica': self.mensa_academica,
             'aca': self.mensa_academica,
@@ -100,9 +119,12 @@ class Mensabot(object):
         dispatcher.add_handler(CommandHandler('mensaahorn',
                                               self.mensaahorn_command,
                                               pass_args=True))
+        dispatcher.add_handler(CommandHandler('stats', self.stats_command,
+                                              pass_args=True))
         dispatcher.add_handler(CommandHandler('help', self.help))
+        dispatcher.add_handler(CommandHandler('control', self.control_command,
+                                              pass_args=True))
         logger.info('Configured dispatcher')
-        # I dont know how to correctly implement hte control command yet
 
     def search_parse_canteens(self, args):
         canteen_args = [ self.mensa_arg_map.get(s.lower()) for s in args ]
@@ -172,5 +194,123 @@ class Mensabot(object):
             update.message.reply_html(message_texts.get_menu(menu, date, canteen))
 
 
+    def stats_command(self, bot, update, args):
+        if self.archive is None:
+            update.message.reply_text(message_texts.get_error_no_stats())
+            return
+
+        query = ' '.join(args) or _STATS_DEFAULT_CATEGORY
+        category = _STATS_CATEGORIES.get(query.lower())
+        if category is not None:
+            prices = self.archive.average_price_by_semester(category)
+            update.message.reply_html(
+                message_texts.get_stats_prices(category, prices))
+        else:
+            dishes = self.archive.dish_frequency(query)
+            update.message.reply_html(
+                message_texts.get_stats_dishes(query, dishes))
+
+    # ---------------------------------
+    # Control command
+    # ---------------------------------
+
+    def control_command(self, bot, update, args):
+        if update.message.chat_id not in self.admin_chat_ids:
+            logger.warning('Ignoring /control from chat %s',
+                           update.message.chat_id)
+            return
+
+        # Every action has a parser checking its arguments and a function
+        # carrying it out with the parsed arguments
+        actions = {
+            'cache': (self._parse_no_args, self._control_cache),
+            'flush': (self._parse_control_targets, self._control_flush),
+            'refresh': (self._parse_control_targets, self._control_refresh),
+            'prefetch': (self._parse_control_targets,
+                         self._control_prefetch),
+            'loglevel': (self._parse_loglevel, self._control_loglevel),
+            'cachesize': (self._parse_cachesize, self._control_cachesize),
+        }
+        try:
+            parse, action = actions[args[0].lower()]
+            parsed = parse(args[1:])
+        except (IndexError, KeyError, ValueError):
+            update.message.reply_text(message_texts.get_control_help())
+            return
+
+        try:
+            text = action(parsed)
+        # requests raises ValueError for responses that are not JSON
+        except (requests.RequestException, ValueError) as e:
+            logger.exception('/control %s failed', args[0])
+            text = message_texts.get_error_openmensa(e)
+        update.message.reply_text(text)
+
+    def _parse_no_args(self, args):
+        if args:
+            raise ValueError()
+
+    def _parse_control_targets(self, args):
+        # Returns the canteens and the date named in args. Without a canteen
+        # all canteens are meant, without a date the date is None.
+        canteens = []
+        date = None
+        for arg in args:
+            if arg.lower() in self.mensa_arg_map:
+                canteens.append(self.mensa_arg_map[arg.lower()])
+            elif date is None:
+                date = _parse_date(arg)  # raises ValueError
+            else:
+                raise ValueError()
+        return canteens or self.canteens, date
+
+    def _parse_loglevel(self, args):
+        if len(args) != 1:
+            raise ValueError()
+        level = logging.getLevelName(args[0].upper())
+        if not isinstance(level, int):
+            raise ValueError()
+        return level
+
+    def _parse_cachesize(self, args):
+        if len(args) != 1:
+            raise ValueError()
+        max_bytes = int(args[0])
+        if max_bytes < 0:
+            raise ValueError()
+        return max_bytes
+
+    def _control_cache(self, _):
+        return message_texts.get_control_cache(self.canteens, self.cache)
+
+    def _control_flush(self, targets):
+        canteens, date = targets
+        for canteen in canteens:
+            canteen.flush(date)
+        logger.info('Flushed cache of %s for %s',
+                    ', '.join(c.name for c in canteens), date or 'all dates')
+        return message_texts.get_control_done()
+
+    def _control_refresh(self, targets):
+        canteens, date = targets
+        for canteen in canteens:
+            canteen.refresh(date or datetime.date.today())
+        return message_texts.get_control_done()
+
+    def _control_prefetch(self, targets):
+        canteens, _ = targets
+        available = sum(canteen.prefetch_week() for canteen in canteens)
+        return message_texts.get_control_prefetched(available)
+
+    def _control_loglevel(self, level):
+        logging.getLogger().setLevel(level)
+        logger.info('Changed log level to %s', logging.getLevelName(level))
+        return message_texts.get_control_done()
+
+    def _control_cachesize(self, max_bytes):
+        self.cache.resize(max_bytes)
+        logger.info('Changed cache size to %d bytes', max_bytes)
+        return message_texts.get_control_done()
+
     def help(self, bot, update):
         update.message.reply_text(message_texts.get_help())
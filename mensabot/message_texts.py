@@ -2,6 +2,7 @@
 # as well as menu, help and error messages.
 
 import datetime
+import html
 import re
 
 
@@ -44,6 +45,11 @@ _MENU_ITEM_ORDER = [
 ]
 
 
+def get_menu_categories():
+    """Returns the names of the menu categories in order of display."""
+    return list(_MENU_ITEM_ORDER)
+
+
 def get_humanized_date(date):
     """Returns the date as an easily readable string.
     Takes the form `heute, 10.09.2016` or `Samstag, 10.09.2016`, depending on
@@ -148,6 +154,89 @@ def _get_description(meal, category):
     return '\n'.join(all_descriptions)
 
 
+# ---------------------------------
+# Statistics
+# ---------------------------------
+
+def get_stats_prices(category, prices):
+    """Returns the average price of a category per semester.
+
+    :param category: The category the prices are for
+    :param prices: A list of `(semester, average price)` tuples
+    """
+    if not prices:
+        return f'Für <i>{category}</i> habe ich noch keine Preise gesammelt.'
+    lines = ['{} — {:.2f}€'.format(semester, price)
+             for semester, price in prices]
+    return '\n'.join([f'<b>Durchschnittspreis {category}</b>', *lines])
+
+
+def get_stats_dishes(query, dishes):
+    """Returns how often the dishes matching the query were served.
+
+    :param query: The text the user searched for
+    :param dishes: A list of `(dish name, times served)` tuples
+    """
+    if not dishes:
+        return f'Ein Gericht mit „{html.escape(query)}“ gab es bisher nicht.'
+    lines = ['{}× {}'.format(count, html.escape(name))
+             for name, count in dishes]
+    return '\n'.join(['<b>So oft gab es bisher</b>', *lines])
+
+
+# ---------------------------------
+# Control
+# ---------------------------------
+
+# noinspection PyPep8
+_CONTROL_HELP_TEXT = """
+/control cache - zeigt Inhalt, Größe und Trefferquote des Caches
+/control flush [Mensa] [Tag] - leert den Cache, ganz oder für eine Mensa oder einen Tag
+/control refresh [Mensa] [Tag] - lädt den Speiseplan neu, ohne Tag für heute
+/control prefetch [Mensa] - lädt die Speisepläne der nächsten sieben Tage
+/control loglevel `Level` - setzt das Log-Level, z. B. `DEBUG` oder `INFO`
+/control cachesize `Bytes` - setzt die Größe des Caches
+"""
+
+
+def get_control_help():
+    return _CONTROL_HELP_TEXT
+
+
+def get_control_cache(canteens, cache):
+    """Returns an overview of the menu cache.
+
+    :param canteens: The canteens sharing the cache
+    :param cache: The menu cache
+    """
+    parts = []
+    for canteen in canteens:
+        lookups = canteen.cache_hits + canteen.cache_misses
+        hit_ratio = canteen.cache_hits / lookups if lookups else 0
+        entries = canteen.cache_entries()
+        lines = ['{}: {} Einträge, {} Bytes, {:.0%} Treffer'.format(
+            canteen.name, len(entries), sum(size for _, size, _ in entries),
+            hit_ratio)]
+        lines += ['{} — {} Bytes, bis {:%d.%m. %H:%M}'.format(
+            date.isoformat(), size, good_through)
+            for date, size, good_through in sorted(entries)]
+        parts.append('\n'.join(lines))
+    parts.append('Gesamt: {} von {} Bytes'.format(cache.size, cache.max_bytes))
+    return '\n\n'.join(parts)
+
+
+def get_control_prefetched(available):
+    return f'{available} Speisepläne geladen'
+
+
+def get_control_done():
+    return 'Erledigt'
+
+
+def get_error_openmensa(error):
+    return f'OpenMensa ist nicht erreichbar: {error}'
+
+
 # ---------------------------------
 # Additional text
 # ---------------------------------
@@ -158,6 +247,9 @@ Dieser Bot gibt den Speiseplan der Mensa Academica an der RWTH Aachen aus.
 
 /mensa - für den heutigen Speiseplan
 /mensa `Tag` - sendet den Speiseplan für den gewählten `Tag`. Dabei kann `Tag` unter anderem `heute`, `Mittwoch` oder ein Datum im Format `YYYY-MM-DD` sein.
+/stats - Durchschnittspreis des Tellergerichts pro Semester
+/stats `Kategorie` - Durchschnittspreis einer Kategorie wie `Pasta` pro Semester
+/stats `Gericht` - wie oft es ein Gericht wie `Currywurst` bisher gab
 """
 
 
@@ -206,3 +298,6 @@ def get_error_multiple_dates():
 
 def get_error_multiple_canteens():
     return 'Ich kann nur das Menü für eine Mensa auf einmal senden'
+
+def get_error_no_stats():
+    return 'Für diesen Bot ist kein Speiseplan-Archiv eingerichtet'
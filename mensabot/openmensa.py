@@ -1,10 +1,16 @@
+from collections import OrderedDict
 import datetime
+import hashlib
+import json
 from threading import RLock
 import logging
 import re
+import sys
 
 import requests
 
+from . import freshness
+
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +20,8 @@ logger = logging.getLogger(__name__)
 
 _CLOSED = object()
 _OPENMENSA_MEAL_URL = 'http://openmensa.org/api/v2/canteens/{}/days/{}/meals'
-_CACHE_SIZE = 7
-_CACHE_KEEP_DAYS = datetime.timedelta(days=7)
+_CACHE_MAX_BYTES = 512 * 1024
+_REQUESTS_TIMEOUT = 10  # seconds
 _REQUESTS_HEADERS = {'User-Agent': '@rwthmensabot Telegram Bot. Please contact @rcurve on telegram in case of problems'}
 
 
@@ -23,49 +29,121 @@ _REQUESTS_HEADERS = {'User-Agent': '@rwthmensabot Telegram Bot. Please contact @
 # Mensa Cache
 # ---------------------------------
 
+def _measure(value, strings):
+    """Returns the size of the containers in a cached value in bytes.
+
+    Strings are not counted but collected in `strings`, keyed by their id,
+    so that strings shared between entries can be counted once.
+    """
+    if isinstance(value, str):
+        strings[id(value)] = value
+        return 0
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_measure(k, strings) + _measure(v, strings)
+                    for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_measure(v, strings) for v in value)
+    return size
+
+
 class OpenMensaCacheEntry(object):
     def __init__(self, cache_value, good_through):
         self.cache_value = cache_value
         self.good_through = good_through
-        self.last_used = datetime.datetime.now()
+        strings = {}
+        self.container_size = _measure(cache_value, strings)
+        self.strings = list(strings.values())
+        # Size of the entry on its own, including strings shared with others
+        self.size = self.container_size \
+            + sum(sys.getsizeof(s) for s in self.strings)
 
 # We use a Mutex when altering the cache. This incurs some overhead but we
 # switched our exec model before to a multi-threaded one and we might want
 # to use multi threaded features from ptb at some point.
+#
+# The cache is shared by all canteens, keys are `(canteen id, date)`. It is
+# bounded by the estimated size of its entries in bytes, as reported by
+# `sys.getsizeof`, so allocator overhead is not included and the budget is
+# approximate. Strings shared by several entries, e.g. interned side
+# dishes, are counted once. Entries are kept in order of use, so the least
+# recently used entry is always the first one.
 class OpenMensaCache(object):
-    def __init__(self, cache_size):
-        self._cache_data = {}
-        self._cache_size = cache_size
+    def __init__(self, max_bytes=_CACHE_MAX_BYTES):
+        self._cache_data = OrderedDict()
+        # id of a string -> number of entries holding it
+        self._string_refs = {}
+        self.max_bytes = max_bytes
+        self.size = 0
         self._mutex = RLock()
+    def _add(self, key, entry):
+        self._cache_data[key] = entry
+        self.size += entry.container_size
+        for s in entry.strings:
+            if id(s) in self._string_refs:
+                self._string_refs[id(s)] += 1
+            else:
+                self._string_refs[id(s)] = 1
+                self.size += sys.getsizeof(s)
+    def _remove(self, key):
+        entry = self._cache_data.pop(key)
+        self.size -= entry.container_size
+        for s in entry.strings:
+            self._string_refs[id(s)] -= 1
+            if self._string_refs[id(s)] == 0:
+                del self._string_refs[id(s)]
+                self.size -= sys.getsizeof(s)
     def _remove_expired(self):
         now = datetime.datetime.now()
         to_be_removed = [k for k,v in self._cache_data.items() if v.good_through < now]
         for k in to_be_removed:
-            del self._cache_data[k]
-    def _remove_least_recently_used(self):
-        lru_key, _ = min(self._cache_data, key=lambda k: k[1].last_used)
-        del self._cache_data[lru_key]
-    def encache(self, date, cache_value, good_through):
+            self._remove(k)
+    def _shrink(self, max_bytes):
+        if self.size > max_bytes:
+            self._remove_expired()
+        while self.size > max_bytes:
+            self._remove(next(iter(self._cache_data)))
+    def encache(self, key, cache_value, good_through):
+        entry = OpenMensaCacheEntry(cache_value, good_through)
         with self._mutex:
-            if len(self._cache_data) >= self._cache_size:
-                self._remove_expired()
-            # The cache should never have more than _cache_size entries.
-            # But just to be sure whe make this a while loop.
-            while len(self._cache_data) >= self._cache_size:
-                self._remove_least_recently_used()
-            self._cache_data[date] = OpenMensaCacheEntry(cache_value, good_through)
-    def get(self, date):
+            if key in self._cache_data:
+                self._remove(key)
+            if entry.size > self.max_bytes:
+                logger.warning('Not caching %s, %d bytes exceed the cache size',
+                               key, entry.size)
+                return
+            # The new entry is the most recently used one and fits on its
+            # own, so shrinking evicts older entries only
+            self._add(key, entry)
+            self._shrink(self.max_bytes)
+    def get(self, key):
         with self._mutex:
-            if not date in self._cache_data:
+            if not key in self._cache_data:
                 raise KeyError()
-            if self._cache_data[date].good_through <= datetime.datetime.now():
-                del self._cache_data[date]
+            entry = self._cache_data[key]
+            if entry.good_through <= datetime.datetime.now():
+                self._remove(key)
                 raise KeyError()
-            self._cache_data[date].last_used = datetime.datetime.now()
-        return self._cache_data[date].cache_value
+            self._cache_data.move_to_end(key)
+            return entry.cache_value
+    def entries(self):
+        """Returns `(key, size, good_through)` for every cached entry."""
+        with self._mutex:
+            return [(k, v.size, v.good_through)
+                    for k, v in self._cache_data.items()]
+    def remove(self, key):
+        with self._mutex:
+            if key in self._cache_data:
+                self._remove(key)
+    def resize(self, max_bytes):
+        with self._mutex:
+            self.max_bytes = max_bytes
+            self._shrink(max_bytes)
     def flush(self):
         with self._mutex:
-            self._cache_data = {}
+            self._cache_data = OrderedDict()
+            self._string_refs = {}
+            self.size = 0
 
 
 # ---------------------------------
@@ -117,8 +195,10 @@ def _make_dict_from_response(response):
     if all(map(lambda meal: 'geschlossen' in meal['name'], response)):
         return _CLOSED
 
+    # Categories, side dishes and notes recur on most days and in every
+    # canteen, interning them lets all cached menus share one copy.
     for meal in response:
-        category = meal['category']
+        category = sys.intern(meal['category'])
 
         # Clean up description
         # Remove multiple whitespace
@@ -133,27 +213,47 @@ def _make_dict_from_response(response):
             r',',
             description
         )
+        description = sys.intern(description)
+        notes = [sys.intern(note) for note in meal.get('notes', [])]
 
         # If entry for category already exists, append new description
         if category in dictionary:
             dictionary[category]['name'].append(description)
-            dictionary[category]['notes'].append(meal.get('notes', []))
+            dictionary[category]['notes'].append(notes)
         else:  # Make new entry
-            dictionary[category] = {'name': [description], 'price': meal.get('prices', {}).get('students'), 'notes': [meal.get('notes', [])]}
+            dictionary[category] = {'name': [description], 'price': meal.get('prices', {}).get('students'), 'notes': [notes]}
 
     return dictionary
 
 
+def _menu_fingerprint(menu):
+    """Returns a string that changes whenever the menu changes."""
+    if menu is None:
+        return freshness.MISSING
+    if menu is _CLOSED:
+        return freshness.CLOSED
+    serialized = json.dumps(menu, sort_keys=True).encode()
+    return hashlib.sha1(serialized).hexdigest()
+
+
 # ---------------------------------
 # Canteen
 # ---------------------------------
 
 
 class OpenMensaCanteen(object):
-    def __init__(self, openmensa_id, mensa_name):
+    def __init__(self, openmensa_id, mensa_name, archive=None, cache=None):
         self.id = openmensa_id
         self.name = mensa_name
-        self._cache = OpenMensaCache(_CACHE_SIZE)
+        self.archive = archive
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.freshness_policy = freshness.AdaptiveFreshnessPolicy()
+        self.change_rate = freshness.ChangeRate()
+        self.fetch_recorder = None
+        if cache is None:
+            cache = OpenMensaCache()
+        self._cache = cache
 
     # locale.setlocale(locale.LC_TIME, 'de_DE')
 
@@ -167,19 +267,27 @@ class OpenMensaCanteen(object):
         """
         _validate_date(date)
 
+        fingerprint = None
         try:
-            menu = self._cache.get(date)
+            menu = self._cache.get((self.id, date))
+            self.cache_hits += 1
             logger.debug('Plan for date %s found in cache. Returning.', date.isoformat())
         except KeyError:
+            self.cache_misses += 1
             logger.debug('Plan for date %s not in cache. Loading.', date.isoformat())
             menu = self._retrieve_menu(date)
-            encache_until = self._encache_until_datetime(date, menu)
+            fingerprint = _menu_fingerprint(menu)
+            self.change_rate.observe(date, fingerprint, datetime.date.today())
+            encache_until = self._encache_until_datetime(date, fingerprint)
 
             if encache_until is not None:
-                self._cache.encache(date, menu, encache_until)
+                self._cache.encache((self.id, date), menu, encache_until)
+
+        if self.fetch_recorder is not None:
+            self.fetch_recorder.record(self.id, date, fingerprint)
 
         if menu is None:
-            raise NoMenuAvailable()
+            raise NoMenuAvailableError()
         if menu is _CLOSED:
             raise CanteenClosedError()
 
@@ -188,21 +296,63 @@ class OpenMensaCanteen(object):
     def _retrieve_menu(self, date):
         raw_response = requests.get(_OPENMENSA_MEAL_URL.format(self.id,
                                         date.isoformat()),
-                                    headers=_REQUESTS_HEADERS)
+                                    headers=_REQUESTS_HEADERS,
+                                    timeout=_REQUESTS_TIMEOUT)
         if raw_response.text == ' ':
             return None
 
         json_response = raw_response.json()
-        return _make_dict_from_response(json_response)
+        menu = _make_dict_from_response(json_response)
+        if self.archive is not None:
+            self.archive.append(self.id, date, menu)
+        return menu
 
-    def _encache_until_datetime(self, date, menu):
-        # Decides for how long a response should be cached by OpenMnesaCache
+    def _encache_until_datetime(self, date, fingerprint):
+        # Decides for how long a response should be cached by OpenMensaCache
         # Returns None if it should not be cached
-        if menu is None: # We dont have a menu yet, cache not so long
-            pass
-        # responses for more than a few days ago are unlikely to be requested often -> do not ache
-        if datetime.date.today() - date >= datetime.timedelta(days=2):
+        ttl = self.freshness_policy.ttl(date, datetime.date.today(),
+                                        fingerprint, self.change_rate.rate)
+        if ttl is None:
             return None
-        # Cache everything else for at most _CACHE_KEEP_DAYS days
-        return datetime.datetime.now() + _CACHE_KEEP_DAYS
+        return datetime.datetime.now() + ttl
+
+    def cache_entries(self):
+        """Returns `(date, size, good_through)` for this canteen's cached menus."""
+        return [(key[1], size, good_through)
+                for key, size, good_through in self._cache.entries()
+                if key[0] == self.id]
+
+    def flush(self, date=None):
+        """Removes this canteen's menus from the cache.
+
+        :param date: Only remove the menu for this date if given
+        """
+        if date is None:
+            dates = [d for d, _, _ in self.cache_entries()]
+        else:
+            dates = [date]
+        for d in dates:
+            self._cache.remove((self.id, d))
+
+    def refresh(self, date):
+        """Fetches the menu for the given date again, bypassing the cache."""
+        self.flush(date)
+        try:
+            self.get_menu_by_date(date)
+        except NoMenuAvailableError:
+            pass
 
+    def prefetch_week(self):
+        """Loads the menus of the next seven days into the cache.
+
+        :return: The number of days a menu is available for
+        """
+        today = datetime.date.today()
+        available = 0
+        for days in range(7):
+            try:
+                self.get_menu_by_date(today + datetime.timedelta(days=days))
+                available += 1
+            except NoMenuAvailableError:
+                pass
+        return available
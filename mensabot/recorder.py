@@ -0,0 +1,79 @@
+# Records incoming commands so that real traffic can be replayed against
+# the dispatcher later on (see scripts/replay.py).
+
+import json
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from .jsonlines import JsonLinesWriter
+
+logger = logging.getLogger(__name__)
+
+
+def parse_command(text):
+    """Splits a message text into command and arguments.
+
+    :param text: The raw message text, e.g. `/mensa@rwthmensabot vita morgen`
+    :return: A tuple `(command, args)` or `None` if the text is no command
+    """
+    if not text or not text.startswith('/') or len(text) < 2:
+        return None
+    command, *args = text.split()
+    return command[1:].split('@')[0].lower(), args
+
+
+class UpdateRecorder(object):
+    """Appends every incoming command to a JSONL file.
+
+    Only the command, its arguments and the time of arrival are written.
+    User, chat and message ids are left out so that recordings can be
+    shared.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = JsonLinesWriter(path)
+
+    def configure_dispatcher(self, dispatcher):
+        # Group -1 runs before the command handlers and does not stop them
+        dispatcher.add_handler(TypeHandler(Update, self.record), group=-1)
+        logger.info('Recording updates to %s', self.path)
+
+    def record(self, bot, update):
+        if update.message is None:
+            return
+        parsed = parse_command(update.message.text)
+        if parsed is None:
+            return
+        command, args = parsed
+        self._writer.write({'time': round(time.time(), 3),
+                            'command': command, 'args': args})
+
+
+def load_recording(path, max_gap):
+    """Reads a recording and returns `(offset, command, args)` tuples.
+
+    Offsets are seconds since the first entry. Gaps longer than `max_gap`
+    (e.g. while the bot was restarted) are shortened to `max_gap`.
+    """
+    with open(path, encoding='utf-8') as f:
+        entries = sorted((json.loads(line) for line in f if line.strip()),
+                         key=lambda e: e['time'])
+    result = []
+    offset = 0
+    for idx, entry in enumerate(entries):
+        if idx > 0:
+            offset += min(entry['time'] - entries[idx - 1]['time'], max_gap)
+        result.append((offset, entry['command'], entry['args']))
+    return result
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0
+    rank = max(int(round(p / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
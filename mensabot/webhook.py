@@ -0,0 +1,136 @@
+# Webhook server that answers an update in the HTTP response.
+#
+# Telegram accepts one method call as the body of the response to a webhook
+# request. If handling an update produces exactly one message, it is
+# returned that way, which saves a separate request to the Bot API. Updates
+# producing more than one message, or taking longer than the reply
+# deadline, are answered through the API as usual.
+
+import json
+import logging
+import threading
+from socketserver import ThreadingMixIn
+
+from telegram import Update
+from telegram.ext import Updater
+from telegram.utils.webhookhandler import (WebhookHandler, WebhookServer,
+                                           _InvalidPost)
+
+logger = logging.getLogger(__name__)
+
+
+class _ReplyCollectingBot(object):
+    """Wraps a `telegram.Bot` and holds back messages instead of sending
+    them. Everything else is passed through to the wrapped bot."""
+
+    def __init__(self, bot):
+        self._bot = bot
+        self.replies = []
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.replies.append(dict(kwargs, chat_id=chat_id, text=text))
+
+    def send_replies(self):
+        for reply in self.replies:
+            try:
+                self._bot.send_message(**reply)
+            except Exception:
+                logger.exception('Could not send reply to chat %s',
+                                 reply['chat_id'])
+
+
+def _webhook_payload(reply):
+    payload = {k: v for k, v in reply.items() if v is not None}
+    payload['method'] = 'sendMessage'
+    return payload
+
+
+class InlineReplyWebhookServer(ThreadingMixIn, WebhookServer):
+    # Updates are handled in the request thread, so serve them concurrently
+    daemon_threads = True
+    # Seconds to wait for a reply before acknowledging the update without
+    # one and sending the replies through the Bot API later
+    reply_deadline = 5
+
+    def __init__(self, server_address, RequestHandlerClass, update_queue,
+                 webhook_path, bot, dispatcher):
+        super(InlineReplyWebhookServer, self).__init__(
+            server_address, RequestHandlerClass, update_queue, webhook_path,
+            bot)
+        self.dispatcher = dispatcher
+
+
+class InlineReplyWebhookHandler(WebhookHandler):
+    def do_POST(self):
+        try:
+            self._validate_post()
+            clen = self._get_content_len()
+        except _InvalidPost as e:
+            self.send_error(e.http_code)
+            self.end_headers()
+            return
+
+        bot = _ReplyCollectingBot(self.server.bot)
+        update = Update.de_json(json.loads(self.rfile.read(clen).decode()),
+                                bot)
+        handling = threading.Thread(
+            target=self.server.dispatcher.process_update, args=(update,))
+        handling.start()
+        handling.join(self.server.reply_deadline)
+        in_time = not handling.is_alive()
+
+        body = b''
+        if in_time and len(bot.replies) == 1:
+            body = json.dumps(_webhook_payload(bot.replies[0])).encode()
+
+        self.send_response(200)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+        # Acknowledge the update before talking to the Bot API or waiting
+        # any longer, otherwise Telegram times out and delivers it again
+        if not in_time:
+            logger.warning('Update %d missed the reply deadline',
+                           update.update_id)
+            handling.join()
+            bot.send_replies()
+        elif len(bot.replies) > 1:
+            bot.send_replies()
+
+
+class InlineReplyUpdater(Updater):
+    """An `Updater` whose webhook answers updates in the HTTP response.
+
+    SSL has to be terminated in front of the bot, `start_webhook` raises
+    `ValueError` if `cert` or `key` are passed. The webhook is not set
+    either, `webhook_url` is ignored like it is upstream without SSL.
+    """
+
+    def start_webhook(self, listen='127.0.0.1', port=80, url_path='',
+                      cert=None, key=None, **kwargs):
+        if cert is not None or key is not None:
+            raise ValueError('SSL is not supported with inline replies')
+        return super(InlineReplyUpdater, self).start_webhook(
+            listen, port, url_path, **kwargs)
+
+    def _start_webhook(self, listen, port, url_path, cert, key,
+                       bootstrap_retries, clean, webhook_url,
+                       allowed_updates):
+        logger.debug('Updater thread started (webhook with inline replies)')
+        if clean:
+            logger.warning('cleaning updates is not supported if '
+                           'SSL-termination happens elsewhere; skipping')
+        if not url_path.startswith('/'):
+            url_path = '/{}'.format(url_path)
+
+        self.httpd = InlineReplyWebhookServer(
+            (listen, port), InlineReplyWebhookHandler, self.update_queue,
+            url_path, self.bot, self.dispatcher)
+        self.httpd.serve_forever(poll_interval=1)
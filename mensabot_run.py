@@ -6,6 +6,10 @@ from telegram.ext import Updater
 import click
 
 from mensabot import Mensabot
+from mensabot.archive import MenuArchive
+from mensabot.freshness import FRESHNESS_POLICIES, FetchRecorder
+from mensabot.recorder import UpdateRecorder
+from mensabot.webhook import InlineReplyUpdater
 
 try:
     from dotenv import load_dotenv, find_dotenv
@@ -51,7 +55,19 @@ def start_webhook(updater, port, local_urlpath, bind, webhook_path=None):
 @click.option('--port', default=0)
 @click.option('--debug', is_flag=True)
 @click.option('--bind', default='127.0.0.1')
-def main(webhook, port, debug, bind):
+@click.option('--inline-replies', is_flag=True, default=False,
+              help='Return single replies in the webhook response.')
+@click.option('--record', type=click.Path(dir_okay=False), default=None,
+              help='Record incoming commands to this JSONL file.')
+@click.option('--freshness', type=click.Choice(sorted(FRESHNESS_POLICIES)),
+              default='adaptive',
+              help='Policy deciding how long menus are cached.')
+@click.option('--record-fetches', type=click.Path(dir_okay=False),
+              default=None, help='Record menu lookups to this JSONL file.')
+@click.option('--cache-bytes', type=int, default=None,
+              help='Memory budget of the menu cache in bytes.')
+def main(webhook, port, debug, bind, inline_replies, record, freshness,
+         record_fetches, cache_bytes):
     if dotenv_imported:
         load_dotenv(find_dotenv())
 
@@ -68,10 +84,32 @@ def main(webhook, port, debug, bind):
         logger.critical("Environment variable `TELEGRAM_TOKEN` was not set.")
         sys.exit(1)
 
-    bot = Mensabot()
-    updater = Updater(token)
+    # the menu archive for /stats is optional
+    archive = None
+    if os.environ.get('MENSABOT_ARCHIVE'):
+        archive = MenuArchive(os.environ['MENSABOT_ARCHIVE'])
+        logger.info('Archiving menus to %s', archive.path)
+
+    # chats allowed to use /control, comma separated
+    admin_chat_ids = [int(chat_id) for chat_id in
+                      os.environ.get('MENSABOT_ADMIN_CHAT_IDS', '').split(',')
+                      if chat_id.strip()]
+
+    bot = Mensabot(archive, admin_chat_ids)
+    if cache_bytes is not None:
+        bot.cache.max_bytes = cache_bytes
+    fetch_recorder = FetchRecorder(record_fetches) if record_fetches else None
+    for canteen in bot.canteens:
+        canteen.freshness_policy = FRESHNESS_POLICIES[freshness]()
+        canteen.fetch_recorder = fetch_recorder
+    if webhook and inline_replies:
+        updater = InlineReplyUpdater(token)
+    else:
+        updater = Updater(token)
 
     bot.configure_dispatcher(updater.dispatcher)
+    if record:
+        UpdateRecorder(record).configure_dispatcher(updater.dispatcher)
 
     if webhook:
         logger.info('Using webhook mode')
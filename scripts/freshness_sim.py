@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# Compares the freshness policies on a history recorded with
+# `mensabot_run.py --record-fetches`.
+import json
+import os
+import sys
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+from mensabot.freshness import FRESHNESS_POLICIES, simulate  # noqa: E402
+
+
+@click.command()
+@click.argument('history', type=click.Path(exists=True))
+def main(history):
+    with open(history, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    print('{:<10} {:>8} {:>8} {:>10}'.format('policy', 'lookups', 'hits',
+                                             'stale'))
+    for name, policy in sorted(FRESHNESS_POLICIES.items()):
+        result = simulate(policy(), entries)
+        lookups = result.hits + result.misses
+        print('{:<10} {:>8} {:>8.1%} {:>10.1%}'.format(
+            name, lookups,
+            result.hits / lookups if lookups else 0,
+            result.stale / lookups if lookups else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Replays a recording made with `mensabot_run.py --record` against a
+# dispatcher configured by `Mensabot.configure_dispatcher`. Replies are
+# captured by a stub bot instead of being sent to Telegram. Unless --live is
+# given, cache misses are served a canned menu instead of being fetched
+# from OpenMensa, so the numbers measure the bot and not openmensa.org.
+import datetime
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+import click
+from telegram import Chat, Message, Update, User
+from telegram.ext import Dispatcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+from mensabot import Mensabot  # noqa: E402
+from mensabot.openmensa import _make_dict_from_response  # noqa: E402
+from mensabot.recorder import load_recording, percentile  # noqa: E402
+
+# OpenMensa response served on cache misses unless --live is given
+_CANNED_RESPONSE = [
+    {'category': 'Tellergericht', 'name': 'Currywurst | Pommes frites',
+     'notes': ['Schwein'], 'prices': {'students': 2.0}},
+    {'category': 'Vegetarisch', 'name': 'Gemüsecurry | Reis',
+     'notes': ['vegan'], 'prices': {'students': 2.5}},
+    {'category': 'Hauptbeilagen', 'name': 'Pommes frites', 'notes': [],
+     'prices': {}},
+    {'category': 'Nebenbeilage', 'name': 'Gemischter Salat', 'notes': [],
+     'prices': {}},
+]
+
+
+class StubBot(object):
+    """Stands in for `telegram.Bot` and captures replies."""
+    id = 0
+    username = 'rwthmensabot'
+
+    def __init__(self):
+        self.replies = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.replies.append((chat_id, text))
+
+
+def make_update(bot, update_id, command, args):
+    user = User(update_id, 'Replay', False)
+    chat = Chat(update_id, Chat.PRIVATE)
+    text = ' '.join(['/' + command, *args])
+    message = Message(update_id, user, datetime.datetime.now(), chat,
+                      text=text, bot=bot)
+    return Update(update_id, message=message)
+
+
+def _process(dispatcher, update, due):
+    dispatcher.process_update(update)
+    return time.monotonic() - due
+
+
+@click.command()
+@click.argument('recording', type=click.Path(exists=True))
+@click.option('--speed', default=1.0, help='Replay speed, e.g. 10 for 10x.')
+@click.option('--workers', default=4, help='Number of worker threads.')
+@click.option('--max-gap', default=60.0,
+              help='Longest pause between two updates in seconds.')
+@click.option('--live', is_flag=True, default=False,
+              help='Fetch menus from OpenMensa instead of a canned menu.')
+def main(recording, speed, workers, max_gap, live):
+    logging.basicConfig(level=logging.WARNING)
+
+    entries = load_recording(recording, max_gap)
+    bot = StubBot()
+    mensabot = Mensabot()
+    if not live:
+        for canteen in mensabot.canteens:
+            canteen._retrieve_menu = \
+                lambda date: _make_dict_from_response(_CANNED_RESPONSE)
+    # Updates are processed by the executor below, not by dispatcher workers
+    dispatcher = Dispatcher(bot, Queue())
+    mensabot.configure_dispatcher(dispatcher)
+
+    futures = []
+    start = time.monotonic()
+    with ThreadPoolExecutor(workers) as executor:
+        for update_id, (offset, command, args) in enumerate(entries):
+            due = start + offset / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            update = make_update(bot, update_id, command, args)
+            futures.append(executor.submit(_process, dispatcher, update, due))
+    duration = time.monotonic() - start
+
+    latencies = sorted(f.result() for f in futures)
+    hits = sum(c.cache_hits for c in mensabot.canteens)
+    lookups = hits + sum(c.cache_misses for c in mensabot.canteens)
+
+    print('updates:    {}'.format(len(latencies)))
+    print('replies:    {}'.format(len(bot.replies)))
+    print('throughput: {:.1f} updates/s'.format(len(latencies) / duration))
+    for p in (50, 95, 99):
+        print('p{}:        {:.1f} ms'.format(
+            p, percentile(latencies, p) * 1000))
+    print('cache hits: {:.1%}'.format(hits / lookups if lookups else 0))
+
+
+if __name__ == '__main__':
+    main()
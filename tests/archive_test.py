@@ -0,0 +1,69 @@
+import datetime
+
+from mensabot.archive import MenuArchive, _RECORD_STRUCT
+
+
+def _menu(tellergericht, price):
+    return {
+        'Tellergericht': {'name': [tellergericht], 'price': price,
+                          'notes': [[]]},
+        'Hauptbeilagen': {'name': ['Pommes', 'Reis'], 'price': None,
+                          'notes': [[], []]},
+    }
+
+
+def test_average_price_by_semester(tmp_path):
+    archive = MenuArchive(str(tmp_path))
+    archive.append(187, datetime.date(2018, 11, 5), _menu('Currywurst', 1.8))
+    archive.append(187, datetime.date(2019, 2, 4), _menu('Linsen', 2.0))
+    archive.append(187, datetime.date(2019, 5, 6), _menu('Currywurst', 2.2))
+
+    assert archive.average_price_by_semester('Tellergericht') == [
+        ('WS 2018/19', 1.9),
+        ('SS 2019', 2.2),
+    ]
+
+
+def test_dish_frequency_survives_reopening(tmp_path):
+    archive = MenuArchive(str(tmp_path))
+    archive.append(187, datetime.date(2019, 5, 6), _menu('Currywurst', 2.2))
+    archive.append(96, datetime.date(2019, 5, 6), _menu('Currywurst', 2.2))
+    archive.append(187, datetime.date(2019, 5, 7), _menu('Linsen', 2.0))
+
+    archive = MenuArchive(str(tmp_path))
+
+    assert archive.dish_frequency('curry') == [('Currywurst', 2)]
+    assert archive.dish_frequency('linsen') == [('Linsen', 1)]
+    assert archive.dish_frequency('schnitzel') == []
+
+
+def test_only_latest_version_of_a_day_counts(tmp_path):
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    archive = MenuArchive(str(tmp_path))
+    archive.append(187, tomorrow, _menu('Currywurst', 2.2))
+    archive.append(187, tomorrow, _menu('Linsen', 2.0))
+
+    archive = MenuArchive(str(tmp_path))
+    # unchanged menus are not archived again
+    archive.append(187, tomorrow, _menu('Linsen', 2.0))
+
+    assert archive.dish_frequency('curry') == []
+    assert archive.dish_frequency('linsen') == [('Linsen', 1)]
+    assert (tmp_path / 'records.bin').stat().st_size == 2 * 3 * _RECORD_STRUCT.size
+
+
+def test_incomplete_writes_are_cut_off(tmp_path):
+    archive = MenuArchive(str(tmp_path))
+    archive.append(187, datetime.date(2019, 5, 6), _menu('Currywurst', 2.2))
+    with open(str(tmp_path / 'records.bin'), 'ab') as f:
+        f.write(b'\0' * 7)
+    with open(str(tmp_path / 'strings.jsonl'), 'a', encoding='utf-8') as f:
+        f.write('"Lins')
+
+    archive = MenuArchive(str(tmp_path))
+    archive.append(187, datetime.date(2019, 5, 7), _menu('Linsen', 2.0))
+
+    assert archive.dish_frequency('curry') == [('Currywurst', 1)]
+    assert archive.dish_frequency('linsen') == [('Linsen', 1)]
+    assert MenuArchive(str(tmp_path)).dish_frequency('linsen') == \
+        [('Linsen', 1)]
@@ -0,0 +1,57 @@
+import datetime
+
+from mensabot.freshness import (CLOSED, MISSING, AdaptiveFreshnessPolicy,
+                                ChangeRate, FixedFreshnessPolicy, simulate)
+
+TODAY = datetime.date(2019, 5, 6)
+
+
+def test_adaptive_policy_depends_on_entry_and_distance():
+    policy = AdaptiveFreshnessPolicy()
+
+    assert policy.ttl(TODAY, TODAY, MISSING, 0.5) == policy.missing
+    assert policy.ttl(TODAY, TODAY, CLOSED, 0.5) == policy.closed
+    assert policy.ttl(TODAY - datetime.timedelta(days=3), TODAY,
+                      'abc', 0.5) == policy.past
+    today = policy.ttl(TODAY, TODAY, 'abc', 0.5)
+    tomorrow = policy.ttl(TODAY + datetime.timedelta(days=1), TODAY,
+                          'abc', 0.5)
+    assert tomorrow < today
+    assert policy.ttl(TODAY, TODAY, 'abc', 0.9) < today
+
+
+def test_change_rate_counts_changed_refetches():
+    change_rate = ChangeRate()
+    change_rate.observe(TODAY, 'a', TODAY)
+    change_rate.observe(TODAY, 'a', TODAY)
+    change_rate.observe(TODAY, 'b', TODAY)
+
+    assert (change_rate.refetches, change_rate.changes) == (2, 1)
+
+
+def test_change_rate_forgets_old_days():
+    change_rate = ChangeRate()
+    change_rate.observe(TODAY, 'a', TODAY)
+    change_rate.observe(TODAY, 'b', TODAY)
+
+    later = TODAY + datetime.timedelta(days=10)
+    change_rate.observe(later, 'c', later)
+    change_rate.observe(later, 'c', later)
+
+    assert (change_rate.refetches, change_rate.changes) == (1, 0)
+
+
+def test_simulate_counts_stale_hits():
+    hour = 3600
+    start = datetime.datetime(2019, 5, 6, 8).timestamp()
+    history = [
+        {'time': start, 'canteen': 187, 'date': '2019-05-06', 'menu': 'a'},
+        {'time': start + hour, 'canteen': 187, 'date': '2019-05-06'},
+        {'time': start + 2 * hour, 'canteen': 187, 'date': '2019-05-06',
+         'menu': 'b'},
+        {'time': start + 3 * hour, 'canteen': 187, 'date': '2019-05-06'},
+    ]
+
+    result = simulate(FixedFreshnessPolicy(), history)
+
+    assert result == (3, 1, 2)
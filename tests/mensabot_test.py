@@ -0,0 +1,104 @@
+import datetime
+import logging
+
+import requests
+
+from mensabot import Mensabot, message_texts
+
+ADMIN = 42
+MONDAY = datetime.date.today() + datetime.timedelta(
+    days=-datetime.date.today().weekday())
+MENU = {'Tellergericht': {'name': ['Currywurst'], 'price': 2.2,
+                          'notes': [[]]}}
+
+
+class FakeMessage(object):
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.replies = []
+
+    def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUpdate(object):
+    def __init__(self, chat_id):
+        self.message = FakeMessage(chat_id)
+
+
+def _control(bot, chat_id, *args):
+    update = FakeUpdate(chat_id)
+    bot.control_command(None, update, list(args))
+    return update.message.replies
+
+
+def _bot_with_cached_menus():
+    bot = Mensabot(admin_chat_ids=[ADMIN])
+    for canteen in bot.canteens:
+        canteen._retrieve_menu = lambda date: MENU
+        canteen.get_menu_by_date(MONDAY)
+    return bot
+
+
+def test_control_ignores_other_chats():
+    bot = _bot_with_cached_menus()
+
+    assert _control(bot, 7, 'flush') == []
+    assert len(bot.cache.entries()) == 3
+
+
+def test_control_flushes_one_canteen():
+    bot = _bot_with_cached_menus()
+
+    _control(bot, ADMIN, 'flush', 'vita', MONDAY.isoformat())
+
+    assert bot.mensa_vita.cache_entries() == []
+    assert len(bot.mensa_academica.cache_entries()) == 1
+
+
+def test_control_changes_log_level_and_cache_size():
+    bot = _bot_with_cached_menus()
+    level = logging.getLogger().level
+    try:
+        _control(bot, ADMIN, 'loglevel', 'debug')
+        assert logging.getLogger().level == logging.DEBUG
+    finally:
+        logging.getLogger().setLevel(level)
+
+    _control(bot, ADMIN, 'cachesize', '0')
+
+    assert bot.cache.size == 0
+
+
+def test_control_shows_help_for_unknown_actions():
+    bot = _bot_with_cached_menus()
+
+    assert _control(bot, ADMIN, 'reboot') == [
+        message_texts.get_control_help()]
+
+
+def test_control_reports_openmensa_errors():
+    bot = _bot_with_cached_menus()
+
+    def fail(date):
+        raise requests.ConnectionError('timeout')
+    bot.mensa_vita._retrieve_menu = fail
+
+    replies = _control(bot, ADMIN, 'refresh', 'vita', MONDAY.isoformat())
+
+    assert replies == [message_texts.get_error_openmensa('timeout')]
+
+
+def test_control_reports_invalid_openmensa_responses(caplog):
+    bot = _bot_with_cached_menus()
+
+    def fail(date):
+        # what requests raises for an HTML error page
+        raise ValueError('Expecting value: line 1 column 1 (char 0)')
+    bot.mensa_vita._retrieve_menu = fail
+
+    replies = _control(bot, ADMIN, 'prefetch', 'vita')
+
+    assert replies == [message_texts.get_error_openmensa(
+        'Expecting value: line 1 column 1 (char 0)')]
+    assert '/control prefetch failed' in caplog.text
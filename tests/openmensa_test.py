@@ -0,0 +1,95 @@
+import datetime
+import json
+import tracemalloc
+
+import pytest
+
+from mensabot.openmensa import OpenMensaCache, _make_dict_from_response
+
+CANTEENS = (187, 95, 96)
+WEEK = [datetime.date(2019, 5, 6) + datetime.timedelta(days=i)
+        for i in range(5)]
+
+
+def _response(canteen_id, date):
+    # Main dishes differ per day and canteen, side dishes and notes recur
+    meals = [
+        {'category': category,
+         'name': '{} {} {}'.format(category, canteen_id, date.isoformat()),
+         'notes': ['Rind', 'Schwein', 'enthält Gluten'],
+         'prices': {'students': 2.5}}
+        for category in ('Tellergericht', 'Vegetarisch', 'Klassiker',
+                         'Empfehlung des Tages', 'Pasta')
+    ]
+    meals += [
+        {'category': 'Hauptbeilagen', 'name': name, 'notes': ['vegan'],
+         'prices': {}}
+        for name in ('Pommes frites', 'Parboiled Reis', 'Salzkartoffeln')
+    ]
+    meals += [
+        {'category': 'Nebenbeilage', 'name': name, 'notes': ['vegan'],
+         'prices': {}}
+        for name in ('Brokkoli', 'Gemischter Salat')
+    ]
+    # Decode from JSON so every response has its own string objects
+    return json.loads(json.dumps(meals))
+
+
+def test_side_dishes_are_shared_between_menus():
+    first = _make_dict_from_response(_response(187, WEEK[0]))
+    second = _make_dict_from_response(_response(96, WEEK[1]))
+
+    assert first['Hauptbeilagen']['name'][0] \
+        is second['Hauptbeilagen']['name'][0]
+    assert first['Tellergericht']['notes'][0][0] \
+        is second['Tellergericht']['notes'][0][0]
+
+
+def _cache_week(menus):
+    cache = OpenMensaCache()
+    good_through = datetime.datetime.now() + datetime.timedelta(days=1)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for key, menu in menus.items():
+            cache.encache(key, menu(), good_through)
+        footprint = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert all(cache.get(key) for key in menus)
+    return cache, footprint
+
+
+def test_interning_shrinks_cache_footprint_of_a_week():
+    responses = {(c, d): _response(c, d) for c in CANTEENS for d in WEEK}
+    interned = {key: lambda r=r: _make_dict_from_response(r)
+                for key, r in responses.items()}
+    # The same menus with a separate copy of every string
+    parsed = {key: json.dumps(_make_dict_from_response(r))
+              for key, r in responses.items()}
+    copied = {key: lambda p=p: json.loads(p) for key, p in parsed.items()}
+
+    interned_cache, interned_footprint = _cache_week(interned)
+    copied_cache, copied_footprint = _cache_week(copied)
+
+    assert interned_footprint < 0.75 * copied_footprint
+    assert interned_cache.size < 0.75 * copied_cache.size
+    assert interned_cache.size <= interned_cache.max_bytes
+
+
+def test_cache_evicts_least_recently_used_beyond_budget():
+    menu = _make_dict_from_response(_response(187, WEEK[0]))
+    good_through = datetime.datetime.now() + datetime.timedelta(days=1)
+    cache = OpenMensaCache()
+    cache.encache('a', menu, good_through)
+    cache.max_bytes = 2 * cache.size
+    cache.encache('b', menu, good_through)
+    cache.get('a')
+
+    cache.encache('c', menu, good_through)
+
+    assert cache.get('a') and cache.get('c')
+    with pytest.raises(KeyError):
+        cache.get('b')
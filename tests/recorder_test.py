@@ -0,0 +1,40 @@
+import json
+
+from mensabot.recorder import load_recording, parse_command, percentile
+
+
+def test_parse_command_strips_bot_name():
+    assert parse_command('/Mensa@rwthmensabot vita morgen') == \
+        ('mensa', ['vita', 'morgen'])
+
+
+def test_parse_command_ignores_other_text():
+    assert parse_command('Hallo /mensa') is None
+    assert parse_command('/') is None
+    assert parse_command(None) is None
+
+
+def test_load_recording_shortens_long_gaps(tmp_path):
+    recording = tmp_path / 'recording.jsonl'
+    entries = [
+        {'time': 1000.0, 'command': 'mensa', 'args': []},
+        {'time': 1002.0, 'command': 'help', 'args': []},
+        {'time': 5000.0, 'command': 'mensa', 'args': ['vita']},
+    ]
+    # Entries out of order are sorted by time
+    recording.write_text('\n'.join(json.dumps(e) for e in reversed(entries)))
+
+    assert load_recording(str(recording), max_gap=10) == [
+        (0, 'mensa', []),
+        (2.0, 'help', []),
+        (12.0, 'mensa', ['vita']),
+    ]
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) == 0
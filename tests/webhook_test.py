@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+import urllib.request
+from queue import Queue
+
+import pytest
+from telegram.ext import CommandHandler, Dispatcher
+
+from mensabot import Mensabot
+from mensabot.webhook import (InlineReplyUpdater, InlineReplyWebhookHandler,
+                              InlineReplyWebhookServer)
+
+
+class FakeBot(object):
+    id = 1
+    username = 'rwthmensabot'
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+@pytest.fixture
+def webhook():
+    bot = FakeBot()
+    dispatcher = Dispatcher(bot, Queue())
+    Mensabot().configure_dispatcher(dispatcher)
+    server = InlineReplyWebhookServer(('127.0.0.1', 0),
+                                      InlineReplyWebhookHandler, Queue(),
+                                      '/token', bot, dispatcher)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield bot, server
+    server.shutdown()
+    thread.join()
+
+
+def _post(server, text):
+    update = {
+        'update_id': 1,
+        'message': {
+            'message_id': 1, 'date': 0, 'text': text,
+            'chat': {'id': 5, 'type': 'private'},
+            'from': {'id': 5, 'first_name': 'Test', 'is_bot': False},
+        },
+    }
+    request = urllib.request.Request(
+        'http://127.0.0.1:{}/token'.format(server.server_port),
+        json.dumps(update).encode(), {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def _wait_for_replies(bot, count):
+    deadline = time.monotonic() + 5
+    while len(bot.sent) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_single_reply_is_returned_in_response(webhook):
+    bot, server = webhook
+
+    body = json.loads(_post(server, '/help').decode())
+
+    assert body['method'] == 'sendMessage'
+    assert body['chat_id'] == 5
+    assert body['text'].startswith('\nDieser Bot')
+    assert bot.sent == []
+
+
+def test_multiple_replies_are_sent_through_the_api(webhook):
+    bot, server = webhook
+
+    # unknown argument and closed canteen on saturdays
+    assert _post(server, '/mensa foo samstag') == b''
+
+    # the replies are sent after the response
+    _wait_for_replies(bot, 2)
+    assert [reply['chat_id'] for reply in bot.sent] == [5, 5]
+
+
+def test_slow_reply_is_sent_through_the_api(webhook):
+    bot, server = webhook
+
+    def slow(_, update):
+        time.sleep(0.5)
+        update.message.reply_text('Spät')
+    server.dispatcher.add_handler(CommandHandler('slow', slow))
+    server.reply_deadline = 0.1
+
+    assert _post(server, '/slow') == b''
+
+    _wait_for_replies(bot, 1)
+    assert [reply['text'] for reply in bot.sent] == ['Spät']
+
+
+def test_ssl_is_rejected():
+    updater = InlineReplyUpdater('123:token')
+
+    with pytest.raises(ValueError):
+        updater.start_webhook(cert='cert.pem', key='key.pem')